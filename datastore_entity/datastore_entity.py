@@ -1,10 +1,143 @@
 """ Base class for the entity model """
 
+import asyncio
+import collections
+import contextlib
+import functools
+import os
+import threading
+import traceback
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
 from google.cloud import datastore
 
 from .entity_value import EntityValue
 
 
+# marks a value not found in a lookup
+_MISSING = object()
+
+# the maximum number of values datastore accepts for an 'IN' filter
+_IN_FILTER_MAX_VALUES = 30
+
+# datastore clients shared by all model objects of a thread(clients
+# are not thread-safe). per thread, they are kept in a dict keyed by
+# (namespace, service_account_json_path, project)
+_THREAD_LOCAL = threading.local()
+
+# thread pools used by fetch_parallel(), one per number of workers. they
+# live as long as the process, so their threads(and the clients of those
+# threads) are reused by every call
+_EXECUTORS = {}
+_EXECUTORS_LOCK = threading.Lock()
+
+
+# state of detect_n_plus_one() for the current thread. 'counting' is set
+# while a counted call runs(the datastore calls it makes are part of it),
+# 'site' is the call site of the code that handed work to the thread
+_DETECT_STATE = threading.local()
+
+# the number of detect_n_plus_one() blocks currently active
+_active_detectors = 0
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _call_site():
+    """
+    Returns the (filename, line number) of the code calling the package,
+    ie. the first frame outside of this package
+    """
+
+    site = getattr(_DETECT_STATE, 'site', None)
+    if site is not None:
+        return site
+
+    for frame in reversed(traceback.extract_stack()):
+        # the separator keeps out sibling directories with the same
+        # prefix(eg. datastore_entity_ext)
+        if not os.path.abspath(frame.filename).startswith(
+                _PACKAGE_DIR + os.sep):
+            return (frame.filename, frame.lineno)
+
+    return (None, None)
+
+
+def _with_caller_state(func):
+    """
+    Wraps a function to be run in another thread, so the datastore calls
+    it makes are counted by detect_n_plus_one() as if made by the caller
+    """
+
+    if not _active_detectors:
+        return func
+
+    counting = getattr(_DETECT_STATE, 'counting', False)
+    site = _call_site()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        _DETECT_STATE.counting = counting
+        _DETECT_STATE.site = site
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _DETECT_STATE.counting = False
+            _DETECT_STATE.site = None
+
+    return wrapper
+
+
+def _executor(max_workers):
+    """
+    Returns the shared thread pool with the given number of workers
+    """
+
+    with _EXECUTORS_LOCK:
+        executor = _EXECUTORS.get(max_workers)
+        if executor is None:
+            executor = _EXECUTORS[max_workers] = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix='datastore-entity')
+
+    return executor
+
+
+def _thread_clients():
+    """
+    Returns the shared datastore clients of the current thread
+    """
+
+    return _THREAD_LOCAL.__dict__.setdefault('clients', {})
+
+
+def _build_client(namespace=None, service_account_json_path=None,
+                  project=None):
+    """
+    Creates a new datastore connection client
+
+    :param namespace: (Optional) datastore namespace to connect to
+    :type namespace: str
+
+    :param service_account_json_path: (Optional) path to service
+                                      account file
+    :type service_account_json_path: str
+
+    :param project: (Optional) the Google Cloud project to connect to.
+                    Defaults to the project of the credentials/environment
+    :type project: str
+
+    :return: datastore connection client
+    """
+
+    if service_account_json_path:
+        return datastore.Client.from_service_account_json(
+            service_account_json_path, project=project, namespace=namespace)
+
+    return datastore.Client(project=project, namespace=namespace)
+
+
 class DatastoreEntity():
     """
     A base class representing a Google Cloud
@@ -38,6 +171,20 @@ class DatastoreEntity():
         ...    # properties/attributes go here
         ...
 
+    Datastore calls that don't depend on each other can run concurrently
+    instead of one after the other, using the ``async`` methods
+    (eg. ``asave()``, ``aget_obj()``, ``aget_multi()``)
+    or ``fetch_parallel()`` for several queries.
+
+    .. code-block:: python
+
+        async def load(keys):
+            return await asyncio.gather(
+                User().aget_obj('username', 'komla'),
+                User().aget_multi(keys))
+
+        user, users = asyncio.run(load(keys))
+
     :param namespace: (Optional) datastore namespace to connect to
     :type namespace: str
 
@@ -45,44 +192,91 @@ class DatastoreEntity():
                                       account file
     :type service_account_json_path: str
 
-    :param conn: whether to connect when initializing model.
-                 Useful for testing or for deferring connection
+    :param project: (Optional) the Google Cloud project to connect to
+    :type project: str
+
+    :param conn: whether the model connects to datastore. The connection
+                 is only made when first needed(eg. on ``save()``), so
+                 initializing a model never connects. Pass ``False`` to
+                 never connect unless ``connect()`` is called.
+                 Useful for testing
     :type conn: boolean
 
+    :param client: (Optional) an existing datastore client to use
+                   instead of connecting
+    :type client: :class: `google.cloud.datastore.client.Client`
+
+    :param cache_backend: (Optional) where entities fetched with
+                          ``cache=True`` are kept. Any dict-like object
+                          (eg. a dict shared by several objects, or a
+                          wrapper around Redis). Defaults to a new dict
+                          for the object, only shared with the objects
+                          it returns
+    :type cache_backend: dict
+
     :raises: :class: `ValueError` if ``__kind__`` is not provided
     """
 
+    # attributes used by every object are kept in slots. the instance
+    # dict is kept for property values and attributes added on the fly
+    __slots__ = ('_conn', '_client_key', '_client', '_key_cache', 'key',
+                 '__datastore_properties_lookup__', '__lookup_set__',
+                 '__dict__', '__weakref__')
+
     #: Required. Name of entity's kind.
     __kind__ = False
 
     #: Optional. A list of properties to exclude from datastore indexes.
     __exclude_from_index__ = []
 
+    # names of the EntityValue attributes declared on the model class
+    # (and its bases). Computed once when the class is created.
+    # the frozenset holds the same names for membership checks
+    __datastore_props__ = ()
+    __datastore_props_set__ = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # walk the class dicts directly(no dir()/getattr()). the first
+        # class in the MRO defining a name wins, so a subclass can
+        # replace an inherited property with a plain attribute
+        props = []
+        seen = set()
+        for klass in cls.__mro__:
+            for name, value in vars(klass).items():
+                if name in seen:
+                    continue
+                seen.add(name)
+                if isinstance(value, EntityValue):
+                    props.append(name)
+
+        cls.__datastore_props__ = tuple(props)
+        cls.__datastore_props_set__ = frozenset(props)
+
+    #: Optional. A client used by all objects of the model instead of
+    #: the shared clients. Set it with ``configure_client()``
+    __client__ = None
+
     def __init__(self, **kwargs):
         namespace = kwargs.get('namespace', None)
         service_account_json_path = kwargs.get(
             'service_account_json_path', None)
-        conn = kwargs.get('conn', True)
-        
-        if conn:
-            if namespace and service_account_json_path:
-                self.ds_client = datastore.Client(
-                    namespace=namespace).from_service_account_json(
-                        service_account_json_path)
-            elif namespace:
-                self.ds_client = datastore.Client(namespace=namespace)
-            elif service_account_json_path:
-                self.ds_client = datastore.Client().from_service_account_json(
-                    service_account_json_path)
-            else:
-                self.ds_client = datastore.Client()
-        else:
-            self.ds_client = None
+        project = kwargs.get('project', None)
 
-        self.key = None
+        # the client is only created(or fetched from the shared clients)
+        # when it is first used. '_client' only holds a client given
+        # explicitly, shared clients are looked up for the current thread
+        self._conn = kwargs.get('conn', True)
+        self._client_key = (namespace, service_account_json_path, project)
+        self._client = kwargs.get('client', None)
 
-        # lookup for entity properties
-        # self.__datastore_properties_lookup__ = []
+        # entities fetched by key, when reading with cache=True
+        self._key_cache = kwargs.get('cache_backend', None)
+        if self._key_cache is None:
+            self._key_cache = {}
+
+        self.key = None
 
         # prepare the lookup list
         self._init_lookup_list()
@@ -92,13 +286,70 @@ class DatastoreEntity():
                 "You must specify the entity 'kind' using __kind__"
                 )
 
-    def connect(self, namespace=None, service_account_json_path=None):
+    @property
+    def ds_client(self):
+        """
+        The datastore connection client of the object.
+        ``None`` when the model is initialized without connection
+
+        Unless a client was given to the object, this is the shared
+        client of the thread using the object
+        """
+
+        if self._client is None and self._conn:
+            return self._shared_client(*self._client_key)
+
+        return self._client
+
+    @ds_client.setter
+    def ds_client(self, client):
+        self._client = client
+
+    @classmethod
+    def _shared_client(cls, namespace=None, service_account_json_path=None,
+                       project=None):
+        """
+        Returns the client configured for the model, or the client shared
+        by all objects of the current thread connecting with the same
+        namespace, credentials and project
+        """
+
+        if cls.__client__ is not None:
+            return cls.__client__
+
+        key = (namespace, service_account_json_path, project)
+        clients = _thread_clients()
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = _build_client(*key)
+
+        return client
+
+    @classmethod
+    def configure_client(cls, client):
+        """
+        Sets the datastore client to be used by all objects of the
+        model(and its subclasses). Useful for testing.
+
+        Pass ``None`` to go back to the shared clients
+
+        :param client: the datastore connection client
+        :type client: :class: `google.cloud.datastore.client.Client`
+        """
+
+        cls.__client__ = client
+
+    def connect(self, namespace=None, service_account_json_path=None,
+                project=None):
         """
         Connect to datastore service.
         Useful when model is initialized without connection or you want to
         connect to a different namespace or connect using a different
         credential
 
+        Objects of the same thread connecting with the same namespace,
+        credentials and project share a single client
+
         :param namespace: (Optional) datastore namespace to connect to
         :type namespace: str
 
@@ -106,21 +357,18 @@ class DatastoreEntity():
                                         account file
         :type service_account_json_path: str
 
+        :param project: (Optional) the Google Cloud project to connect to
+        :type project: str
+
         :return: boolean
 
         """
 
-        if namespace and service_account_json_path:
-            self.ds_client = datastore.Client(
-                namespace=namespace).from_service_account_json(
-                    service_account_json_path)
-        elif namespace:
-            self.ds_client = datastore.Client(namespace=namespace)
-        elif service_account_json_path:
-            self.ds_client = datastore.Client().from_service_account_json(
-                service_account_json_path)
-        else:
-            self.ds_client = datastore.Client()
+        self._conn = True
+        self._client_key = (namespace, service_account_json_path, project)
+        self._client = None
+        # create the client now, so connection errors are raised here
+        self._shared_client(*self._client_key)
 
         return True
 
@@ -131,40 +379,31 @@ class DatastoreEntity():
         datastore properties and populates the lookup list
         """
 
-        # we first reset the lookup list
-        self.__datastore_properties_lookup__ = []
+        # we first reset the lookup list to the properties declared on
+        # the model class. the set mirrors the list for fast membership
+        # checks, copying the class frozenset reuses its hashes
+        self.__datastore_properties_lookup__ = list(
+            self.__datastore_props__)
+        self.__lookup_set__ = set(self.__datastore_props_set__)
 
         if entity:  # when creating object with entity result
-            for k, v in entity.items():
-                self.__datastore_properties_lookup__.append(k)
+            # keep the entity's properties not defined in the model.
+            # declared properties the entity lacks are still saved
+            for prop in entity.keys():
+                self._add_to_lookup(prop)
         else:
-            attrs = dir(self)
-            for attr in attrs:
-                value = getattr(self, attr)
-                if (isinstance(value, EntityValue) and
-                    attr not in self.__datastore_properties_lookup__):
-                    self.__datastore_properties_lookup__.append(attr)
+            # properties added to this instance on the fly
+            for attr, value in vars(self).items():
+                if isinstance(value, EntityValue):
+                    self._add_to_lookup(attr)
 
-    def _convert_to_dict(self):
+    def _add_to_lookup(self, prop):
         """
-        Prepares the dictionary object with the fields for the entity
-
-        returns a dictionary
+        Adds a property name to the lookup list if not already there
         """
-
-        self._init_lookup_list()
-
-        d = {}
-        for attr_name in self.__datastore_properties_lookup__:
-            attr_value = getattr(self, attr_name)
-            if isinstance(attr_value, EntityValue):
-                d[attr_name] = attr_value.value
-            else:
-                # when obj is dynamically populated(by say, WTForms),
-                # the instance will not be an EntityValue type
-                d[attr_name] = attr_value
-
-        return d
+        if prop not in self.__lookup_set__:
+            self.__lookup_set__.add(prop)
+            self.__datastore_properties_lookup__.append(prop)
 
     def save(self, id=None, parent_or_ancestor=None,
              extra_props=None, excludes=None):
@@ -192,46 +431,143 @@ class DatastoreEntity():
 
         """
 
-        data = self._convert_to_dict()  # get the entity values as a dictionary
+        entity = self._build_entity(id, parent_or_ancestor,
+                                    extra_props, excludes)
+
+        self.ds_client.put(entity)
+        self._key_cache.pop(entity.key, None)
+
+        return True
+
+    @classmethod
+    def save_many(cls, instances, client=None, transaction=False):
+        """
+        Saves several model instances with a single datastore call.
+
+        Each instance is saved the same way ``save()`` without arguments
+        would save it (ie. using its key or an incomplete key), but all
+        entities are sent to datastore in one ``put_multi()`` call instead
+        of one call per instance.
+
+        .. code-block:: python
+
+            users = [User(), User()]
+            users[0].username = 'komla'
+            users[1].username = 'seyram'
+            User.save_many(users)
+
+        :param instances: the model instances to save
+        :type instances: list
+
+        :param client: (Optional) datastore client to use. Defaults to the
+                       client of the first instance
+        :type client: :class: `google.cloud.datastore.client.Client`
+
+        :param transaction: whether to save all entities atomically
+                            in a transaction
+        :type transaction: boolean
+
+        :return: boolean
+        """
+        instances = list(instances)
+        if not instances:
+            return True
+
+        ds_client = client or instances[0].ds_client
+
+        # keys are built with the client used for the save, objects
+        # don't need a client of their own
+        entities = [
+            obj._build_entity(None, None, None, None, client=ds_client)
+            for obj in instances]
+
+        if transaction:
+            with ds_client.transaction():
+                ds_client.put_multi(entities)
+        else:
+            ds_client.put_multi(entities)
+
+        for obj, entity in zip(instances, entities):
+            obj._key_cache.pop(entity.key, None)
+
+        return True
+
+    def _build_entity(self, id, parent_or_ancestor, extra_props, excludes,
+                      client=None):
+        """
+        Builds the datastore entity to be saved for this object.
+
+        See ``save()`` for the meaning of the parameters.
+        The key is built with ``client``, defaulting to the object's client
+
+        :return: the datastore entity
+        :rtype: :class: `google.cloud.datastore.entity.Entity`
+        """
 
         # if the object has a key(ie called via .get_obj(), we will use that)
         if self.key:
             key = self.key
-        elif id and parent_or_ancestor:
-            key = self.ds_client.key(
-                self.__kind__, id,
-                parent=parent_or_ancestor)
-        elif id:
-            key = self.ds_client.key(self.__kind__, id)
         else:
-            key = self.ds_client.key(self.__kind__)
+            if client is None:
+                client = self.ds_client
+            if id and parent_or_ancestor:
+                key = client.key(
+                    self.__kind__, id,
+                    parent=parent_or_ancestor)
+            elif id:
+                key = client.key(self.__kind__, id)
+            else:
+                key = client.key(self.__kind__)
 
         entity = datastore.Entity(
             key,
             exclude_from_indexes=self.__exclude_from_index__)
 
-        # Add any additional properties not defined in model
-        if extra_props:
-            for k, v in extra_props.items():
-                if k not in self.__datastore_properties_lookup__:
-                    self.__datastore_properties_lookup__.append(k)
-                data[k] = v
+        self._populate_entity(entity, extra_props, excludes)
 
-        # Exclude selected properties defined in model
-        if excludes:
-            for prop in excludes:
-                # remove an attr if it also in lookup table
-                if prop in self.__datastore_properties_lookup__:
-                    self.__datastore_properties_lookup__.pop(
-                        self.__datastore_properties_lookup__.index(prop))
+        return entity
 
-                data.pop(prop, '')
+    def _populate_entity(self, entity, extra_props, excludes):
+        """
+        Sets the entity's properties from the object's attributes
 
-        entity.update(data)
+        See ``save()`` for the meaning of the parameters
+        """
 
-        self.ds_client.put(entity)
+        # Exclude selected properties defined in model.
+        # this only applies to the current save
+        excludes = set(excludes or ())
 
-        return True
+        # the lookup list is prepared at initialization(or when the object
+        # is populated from an entity). we only need to pick up properties
+        # added to the instance on the fly since then
+        for attr, value in vars(self).items():
+            if isinstance(value, EntityValue):
+                self._add_to_lookup(attr)
+
+        values = vars(self)
+        for attr_name in self.__datastore_properties_lookup__:
+            if attr_name in excludes:
+                continue
+
+            # most values are set in the instance dict. only fall back to
+            # attribute lookup(ie. the property default) when not set
+            value = values.get(attr_name, _MISSING)
+            if value is _MISSING:
+                value = getattr(self, attr_name)
+            # model attributes hold the property values directly, except
+            # EntityValue attributes added to the instance on the fly
+            if isinstance(value, EntityValue):
+                value = value.value
+            entity[attr_name] = value
+
+        # Add any additional properties not defined in model.
+        # like excludes, they only apply to the current save and are
+        # not set on the object(where they could replace its attributes)
+        if extra_props:
+            for k, v in extra_props.items():
+                if k not in excludes:
+                    entity[k] = v
 
     def allocate_ids(self, incomplete_key, num_ids):
         """
@@ -259,7 +595,7 @@ class DatastoreEntity():
 
         return self.ds_client
 
-    def find_by_key(self, key):
+    def find_by_key(self, key, cache=False):
         """
         Performs a search for an entity using it's key
 
@@ -272,14 +608,73 @@ class DatastoreEntity():
         :param key: The datastore key
         :type key: :class: google.cloud.datastore.key.Key
 
+        :param cache: whether to use the entity cache. The entity is
+                      only fetched from datastore if not already cached.
+                      Saving or deleting the entity removes it from the
+                      cache
+        :type cache: boolean
+
         :return: The datastore entity
         :rtype: :class: `google.cloud.datastore.entity.Entity`
         """
+        if cache:
+            entity = self._key_cache.get(key)
+            if entity is not None:
+                return entity
+
         entity = self.ds_client.get(key)
 
+        if cache and entity is not None:
+            self._key_cache[key] = entity
+
         return entity
 
-    def find_by_value(self, prop, val, comparator='=', limit=500):
+    def find_by_keys(self, keys):
+        """
+        Performs a search for several entities using their keys.
+        All entities are fetched with a single datastore call
+
+        `Note:` This returns the entities as-is, as
+        opposed to returning them as model instances
+
+        To retrieve the entities as model instances
+        use ``get_objs_with_keys() method``
+
+        :param keys: The datastore keys
+        :type keys: list of :class: google.cloud.datastore.key.Key
+
+        :return: the datastore entities found. Keys with no matching
+                 entity are left out
+        :rtype: list of :class: `google.cloud.datastore.entity.Entity`
+        """
+        entities = self.ds_client.get_multi(list(keys))
+
+        return entities
+
+    def _build_query(self, filters, ancestor=None):
+        """
+        Builds a query for the model's kind.
+        All queries made by the model are built here
+
+        :param filters: the query filters as (property, operator, value)
+        :type filters: list of tuples
+
+        :param ancestor: (Optional) datastore ancestor key
+        :type ancestor: :class: `google.cloud.datastore.key.Key`
+
+        :return: the query
+        :rtype: :class: `google.cloud.datastore.query.Query`
+        """
+
+        query = self.ds_client.query(kind=self.__kind__, ancestor=ancestor)
+
+        for prop, comparator, value in filters:
+            query.add_filter(prop, comparator, value)
+
+        return query
+
+    def find_by_value(self, prop, val, comparator='=', limit=500,
+                      as_iterator=False):
         """
         Returns a list of entities meeting query requirements
 
@@ -301,39 +696,116 @@ class DatastoreEntity():
         :param limit: the number of entities to fetch
         :type limit: int
 
+        :param as_iterator: whether to return an iterator streaming the
+                            entities instead of a list
+        :type as_iterator: boolean
+
+        :returns: one or more entities
+        :rtype: list or iterator
+        """
+        query = self._build_query([(prop, comparator, val)])
+
+        entities = query.fetch(limit=limit)
+
+        if as_iterator:
+            return entities
+
+        return list(entities)
+
+    def find_by_values(self, prop, values, limit=500, parallel=False):
+        """
+        Returns a list of entities whose property matches any
+        of the given values.
+
+        Datastore accepts at most 30 values for an 'IN' filter, so one
+        query is made for each group of 30 values. That's still far fewer
+        calls than using ``find_by_value()`` for each value.
+        An entity matched by several queries(eg. a list property holding
+        values of different groups) is only returned once
+
+        `Note:` This returns the entity as-is, as
+        opposed to returning it as a model instance
+
+        :param prop: the entity property name
+        :type prop: str
+
+        :param values: the entity property values
+        :type values: list
+
+        :param limit: the number of entities to fetch
+        :type limit: int
+
+        :param parallel: whether to run the queries at the same time
+        :type parallel: boolean
+
         :returns: one or more entities
         :rtype: list
         """
-        query = self.ds_client.query(kind=self.__kind__)
-        query.add_filter(prop, comparator, val)
+        values = list(values)
+        queries = [
+            self._build_query(
+                [(prop, 'IN', values[i:i + _IN_FILTER_MAX_VALUES])])
+            for i in range(0, len(values), _IN_FILTER_MAX_VALUES)]
 
-        entities = list(query.fetch(limit=limit))
+        entities = []
+        seen = set()
 
-        return entities
+        def add(results):
+            for entity in results:
+                if entity.key not in seen:
+                    seen.add(entity.key)
+                    entities.append(entity)
+
+        if parallel:
+            for results in self.fetch_parallel(queries, limit=limit):
+                add(results)
+
+            return entities[:limit]
+
+        for query in queries:
+            if len(entities) >= limit:
+                break
+            add(query.fetch(limit=limit - len(entities)))
 
-    def find_via_parent_or_ancestor(self, parent_or_ancestor, limit=500):
+        return entities[:limit]
+
+    def find_via_parent_or_ancestor(self, parent_or_ancestor, limit=500,
+                                    as_iterator=False,
+                                    filters=(('active', '=', True),)):
         """
         Fetches entities using ancestor key
 
+        Filtering is done by datastore, so only matching entities
+        are fetched. By default only entities with the property
+        ``active`` set to ``True`` are returned
+
         :param parent_or_ancestor: datastore ancestor key
         :type parent_or_ancestor: :class: `google.cloud.datastore.key.Key`
 
         :param limit: number of entities to fetch. max of 500
         :type limit: int
 
+        :param as_iterator: whether to return an iterator streaming the
+                            entities instead of a list
+        :type as_iterator: boolean
+
+        :param filters: the query filters as (property, operator, value).
+                        Pass ``None`` or an empty list for no filter
+        :type filters: list of tuples
+
         :return: one or more entities
-        :rtype: list
+        :rtype: list or iterator
         """
 
-        query = self.ds_client.query(
-            kind=self.__kind__,
-            ancestor=parent_or_ancestor)
+        query = self._build_query(filters or (),
+                                  ancestor=parent_or_ancestor)
 
-        query.add_filter('active', '=', True)
+        entities = query.fetch(limit=limit)
 
-        entities = list(query.fetch(limit=limit))
+        if as_iterator:
+            return entities
 
-        return entities
+        return list(entities)
 
     def get_obj(self, prop, value):
         """
@@ -355,8 +827,7 @@ class DatastoreEntity():
 
         :return: a class object representing the entity
         """
-        query = self.ds_client.query(kind=self.__kind__)
-        query.add_filter(prop, '=', value)
+        query = self._build_query([(prop, '=', value)])
 
         # reset the lookup list
         # self.__datastore_properties_lookup__ = []
@@ -365,23 +836,17 @@ class DatastoreEntity():
         if entities:
             entity = entities[0]
 
-            # generate and populate the class attributes with properties
-            # and values of the fetched entity
-            for k, v in entity.items():
-                # don't populate the class attributes. they are just
-                # blueprints for instantiation
-                setattr(self, k, v)
-
-            # prepare the lookup list using the entity property names retrieved
-            self._init_lookup_list(entity)
-            # we set the entity's key
-            self.key = entity.key
+            # generate and populate the object attributes with properties
+            # and values of the fetched entity. don't populate the class
+            # attributes. they are just blueprints for instantiation.
+            # this also prepares the lookup list and sets the entity's key
+            self._set_from_entity(entity)
 
             return self
         else:
             return None
 
-    def get_obj_with_key(self, key):
+    def get_obj_with_key(self, key, cache=False):
         """
         Similar to get_obj(), but fetches entity using it's key.
 
@@ -394,11 +859,15 @@ class DatastoreEntity():
         :param key: the datastore key
         :type key: datastore key
 
+        :param cache: whether to use the entity cache.
+                      See ``find_by_key()``
+        :type cache: boolean
+
         :return: an object representing the entity
         :rtype: :class: `datastore_entity.datastore_entity.DatastoreEntity`
         """
 
-        entity = self.ds_client.get(key)
+        entity = self.find_by_key(key, cache=cache)
 
         # reset the lookup list
         # self.__datastore_properties_lookup__ = []
@@ -406,20 +875,78 @@ class DatastoreEntity():
         if entity:
             # get all properties. note that some properties may not be
             # defined in the class(ie added via extra_prop)
-            for k, v in entity.items():
-                setattr(self, k, v)
-
-            # prepare the lookup list
-            self._init_lookup_list(entity)
-
-            # before we return the object, we set it's
-            # key(to be used in updates)
-            self.key = key
+            self._set_from_entity(entity)
 
             return self
         else:
             return None
 
+    def _set_from_entity(self, entity):
+        """
+        Replaces the object's properties, values and key with those of
+        the given entity
+        """
+
+        # drop the values of a previously fetched entity(or set before),
+        # so they are not saved with this entity
+        for prop in self.__datastore_properties_lookup__:
+            self.__dict__.pop(prop, None)
+
+        # values are stored straight in the instance dict, where
+        # EntityValue attributes keep them anyway
+        self.__dict__.update(entity)
+
+        self._init_lookup_list(entity)
+        self.key = entity.key
+
+    def get_objs_with_keys(self, keys):
+        """
+        Similar to get_obj_with_key(), but fetches several entities
+        using their keys with a single datastore call.
+
+        A new object is created for each entity found
+
+        :param keys: the datastore keys
+        :type keys: list of datastore keys
+
+        :return: objects representing the entities found. Keys with
+                 no matching entity are left out
+        :rtype: list
+        """
+
+        entities = self.ds_client.get_multi(list(keys))
+
+        return [self._obj_from_entity(entity) for entity in entities]
+
+    def _obj_from_entity(self, entity):
+        """
+        Creates a new object of the model class populated with the
+        properties, values and key of the given entity.
+        The new object shares this object's connection settings
+
+        `Note:` the model's ``__init__()`` is not called for the new object
+
+        :param entity: the datastore entity
+        :type entity: :class: `google.cloud.datastore.entity.Entity`
+
+        :return: a class object representing the entity
+        """
+
+        # skip __init__(). the object is fully set up from the entity
+        # and this object's connection settings
+        obj = self.__class__.__new__(self.__class__)
+        obj._conn = self._conn
+        obj._client_key = self._client_key
+        obj._client = self._client
+        obj._key_cache = self._key_cache
+
+        obj.__dict__.update(entity)
+
+        obj._init_lookup_list(entity)
+        obj.key = entity.key
+
+        return obj
+
     def delete(self):
         """
         Deletes an entity
@@ -428,7 +955,61 @@ class DatastoreEntity():
 
         """
 
-        self.ds_client.delete(self.key)
+        return self.delete_many([self], client=self.ds_client)
+
+    @classmethod
+    def delete_many(cls, items, client=None, cache_backend=None):
+        """
+        Deletes several entities with a single datastore call
+
+        :param items: the model objects or datastore keys of the
+                      entities to delete
+        :type items: list
+
+        :param client: (Optional) datastore client to use. Defaults to the
+                       client of the first object, or the model's shared
+                       client when only keys are given
+        :type client: :class: `google.cloud.datastore.client.Client`
+
+        :param cache_backend: (Optional) an entity cache to remove the
+                              deleted entities from, in addition to the
+                              caches of the given objects
+        :type cache_backend: dict
+
+        :return: boolean
+        """
+        items = list(items)
+        if not items:
+            return True
+
+        objs = [item for item in items if isinstance(item, DatastoreEntity)]
+        keys = [item.key if isinstance(item, DatastoreEntity) else item
+                for item in items]
+
+        if client is None:
+            client = objs[0].ds_client if objs else cls._shared_client()
+
+        client.delete_multi(keys)
+
+        # every deleted key is removed from every cache involved, objects
+        # may share a cache holding entities deleted by key
+        caches = {id(obj._key_cache): obj._key_cache for obj in objs}
+        if cache_backend is not None:
+            caches[id(cache_backend)] = cache_backend
+        for cache in caches.values():
+            for key in keys:
+                cache.pop(key, None)
+
+        return True
+
+    def clear_cache(self):
+        """
+        Removes all entities from the entity cache
+
+        :return: boolean
+        """
+
+        self._key_cache.clear()
 
         return True
 
@@ -469,35 +1050,178 @@ class DatastoreEntity():
 
         :return: a two-element tuple. first element is a list
                         of entity objects and the second is the cursor
-                        for pagination or None
+                        for pagination or None(also when there are
+                        no more entities)
         :rtype: tuple
         """
         next_cursor = None
 
-        query = self.ds_client.query(kind=self.__kind__)
-        query.add_filter(prop, '=', value)
+        query = self._build_query([(prop, '=', value)])
 
+        # a single fetch. the results are read up to 'limit', across
+        # as many datastore batches as needed
         query_res = query.fetch(start_cursor=cursor, limit=limit)
+        entities = list(query_res)
 
         if paginate:
-            current_page = next(query_res.pages)
-            entities = list(current_page)
-            next_cursor = query_res.next_page_token.decode('utf-8')
-        else:
-            entities = list(query_res)
-
-        objs = []
-        for entity in entities:
-            # get all properties. note that properties may not be
-            # defined in the class
-            for k, v in entity.items():
-                setattr(self, k, v)
+            # no token when there are no more results
+            token = query_res.next_page_token
+            next_cursor = token.decode('utf-8') if token else None
 
-            self.key = entity.key
+        # a new object for each entity. note that properties may not be
+        # defined in the class
+        objs = [self._obj_from_entity(entity) for entity in entities]
 
-            objs.append(self)
         return (objs, next_cursor)
 
+    async def _run_in_executor(self, func, *args):
+        """
+        Runs a blocking datastore call in the event loop's default
+        executor so it does not block other coroutines
+        """
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(
+            None, _with_caller_state(functools.partial(func, *args)))
+
+    async def asave(self, id=None, parent_or_ancestor=None,
+                    extra_props=None, excludes=None):
+        """
+        Same as ``save()``, but can be awaited so other datastore
+        calls can run at the same time
+
+        :return: boolean
+        """
+
+        return await self._run_in_executor(
+            self.save, id, parent_or_ancestor, extra_props, excludes)
+
+    async def aget_obj(self, prop, value):
+        """
+        Same as ``get_obj()``, but can be awaited so other datastore
+        calls can run at the same time
+
+        :return: a class object representing the entity
+        """
+
+        return await self._run_in_executor(self.get_obj, prop, value)
+
+    async def aget_multi(self, keys):
+        """
+        Same as ``find_by_keys()``, but can be awaited so other datastore
+        calls can run at the same time
+
+        :return: the datastore entities found
+        :rtype: list of :class: `google.cloud.datastore.entity.Entity`
+        """
+
+        return await self._run_in_executor(self.find_by_keys, keys)
+
+    def fetch_parallel(self, queries, max_workers=8, limit=None):
+        """
+        Runs several datastore queries at the same time and
+        returns their results
+
+        :param queries: the queries to run
+        :type queries: list of :class: `google.cloud.datastore.query.Query`
+
+        :param max_workers: the maximum number of queries running
+                            at the same time
+        :type max_workers: int
+
+        :param limit: (Optional) the number of entities to fetch
+                      for each query
+        :type limit: int
+
+        :return: a list of entities for each query, in the same order
+                 as the queries
+        :rtype: list
+        """
+
+        # clients are not thread-safe. each query is run with the client
+        # of the worker thread instead of the client it was built with.
+        # the workers are shared, so are their clients
+        def fetch(query):
+            return list(query.fetch(limit=limit, client=self.ds_client))
+
+        return list(_executor(max_workers).map(
+            _with_caller_state(fetch), queries))
+
+    @classmethod
+    @contextlib.contextmanager
+    def detect_n_plus_one(cls, threshold=5):
+        """
+        Warns about code calling datastore repeatedly from the same place
+        (eg. ``find_by_key()`` in a loop) where a single batch call
+        (eg. ``find_by_keys()``) could be used instead.
+
+        Datastore calls made inside the ``with`` block are counted by
+        call site. On exit, a warning is issued for each call site with
+        ``threshold`` or more calls.
+
+        Queries made by ``find_by_values()`` and ``fetch_parallel()`` are
+        counted as a single call. Calls run in other threads(eg. by
+        ``asave()``) are counted for the code that started them.
+
+        `Note:` This is meant for development and testing only.
+        It wraps the datastore client methods while active
+
+        .. code-block:: python
+
+            with User.detect_n_plus_one(threshold=5):
+                users = [User().get_obj_with_key(k) for k in keys]
+
+        :param threshold: the number of calls from the same place
+                          to warn about
+        :type threshold: int
+        """
+        global _active_detectors
+
+        calls = collections.Counter()
+
+        def counted(name, method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                # calls made by another counted call(eg. get() calls
+                # get_multi()) are not counted
+                if getattr(_DETECT_STATE, 'counting', False):
+                    return method(*args, **kwargs)
+
+                _DETECT_STATE.counting = True
+                try:
+                    calls[_call_site() + (name,)] += 1
+                    return method(*args, **kwargs)
+                finally:
+                    _DETECT_STATE.counting = False
+
+            return wrapper
+
+        methods = [(datastore.Client, name) for name in (
+            'get', 'get_multi', 'put', 'put_multi',
+            'delete', 'delete_multi')]
+        methods.append((datastore.Query, 'fetch'))
+        methods.extend((DatastoreEntity, name)
+                       for name in ('find_by_values', 'fetch_parallel'))
+
+        originals = [(owner, name, getattr(owner, name))
+                     for owner, name in methods]
+        for owner, name, method in originals:
+            setattr(owner, name, counted(name, method))
+        _active_detectors += 1
+
+        try:
+            yield
+        finally:
+            _active_detectors -= 1
+            for owner, name, method in originals:
+                setattr(owner, name, method)
+
+        for (filename, lineno, name), count in calls.items():
+            if count >= threshold:
+                warnings.warn(
+                    f"Potential N+1 query detected at {filename}:{lineno} "
+                    f"({count} calls to {name})")
+
     def __str__(self):
         return f'<Entity Kind: {self.__kind__}>'
 
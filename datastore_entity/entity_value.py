@@ -7,6 +7,12 @@ class EntityValue:
     This class serves as a way to mark your model
     attributes as a datastore entity property
 
+    On a model instance, the attribute holds the property value
+    itself, starting with the default value given here
+
+    Properties must be declared in the model class body. To add a property
+    later, assign an EntityValue to a model instance instead
+
     .. doctest::
 
         >>> from datastore_entity import DatastoreEntity, EntityValue
@@ -16,5 +22,32 @@ class EntityValue:
                 date_created = EntityValue(datetime.utcnow())
     """
 
+    __slots__ = ('value', '_name')
+
     def __init__(self, value=None):
+        #: the default value of the property
         self.value = value
+        self._name = None
+
+    def __set_name__(self, owner, name):
+        self._name = name
+
+    def _check_name(self):
+        # the name is only known when declared in a class body. an
+        # attribute assigned to the class later would never be saved
+        if self._name is None:
+            raise TypeError(
+                "EntityValue must be declared in the model class body. "
+                "Assign it to a model instance to add a property later")
+
+    def __get__(self, obj, owner=None):
+        # accessed on the model class itself
+        if obj is None:
+            return self
+
+        self._check_name()
+        return obj.__dict__.get(self._name, self.value)
+
+    def __set__(self, obj, value):
+        self._check_name()
+        obj.__dict__[self._name] = value
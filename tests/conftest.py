@@ -0,0 +1,54 @@
+"""
+Shared fixtures for the test cases
+"""
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import datastore
+
+from datastore_entity import datastore_entity as ds_module
+
+
+@pytest.fixture(scope="session")
+def ds_client():
+    """
+    A datastore client shared by all tests.
+    The unit tests never send requests with it, so no credentials
+    are needed
+    """
+    return datastore.Client(
+        project='test', namespace='Tests',
+        credentials=AnonymousCredentials())
+
+
+@pytest.fixture(autouse=True)
+def build_client(request, monkeypatch):
+    """
+    Models connecting to datastore get a mock client instead of a real
+    one, so no test authenticates or sends requests over the network.
+    Each test starts without any shared client.
+
+    Tests marked 'integration' use the real client
+    """
+    if request.node.get_closest_marker('integration'):
+        return None
+
+    build_client = MagicMock(return_value=MagicMock())
+    monkeypatch.setattr(ds_module, '_build_client', build_client)
+    monkeypatch.setattr(ds_module, '_THREAD_LOCAL', threading.local())
+
+    return build_client
+
+
+@pytest.fixture
+def mock_entity(request):
+    """
+    An object of the test module's 'Entity' model that doesn't connect
+    to datastore and uses a mock client instead
+    """
+    entity = request.module.Entity(conn=False)
+    entity.ds_client = MagicMock()
+
+    return entity
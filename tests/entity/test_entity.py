@@ -6,14 +6,29 @@ machine, set up the GOOGLE_APPLICATION_CREDENTIALS
 environment variable with service account key file
 Example:
     export GOOGLE_APPLICATION_CREDENTIALS="/code/auth/dev/datastore-service-account.json"
+
+Only tests marked 'integration' connect to datastore. They are
+skipped by default, run them with:
+    python -m pytest -m integration
 """
+import asyncio
 import datetime
+import os
+import threading
+import warnings
+from unittest.mock import MagicMock
 
 import pytest
+from google.cloud import datastore
 
 # python -m pytest tests
 
 from datastore_entity import DatastoreEntity, EntityValue
+from datastore_entity import datastore_entity as ds_module
+
+
+# fixed default date for the models below
+_FIXED_DT = datetime.datetime(2020, 1, 1)
 
 
 # Mock model
@@ -36,7 +51,7 @@ class UserMixin:
 class DBModel(DatastoreEntity, UserMixin):
     username = EntityValue('foo')
     password = EntityValue(None)
-    date_created = EntityValue(datetime.datetime.utcnow())
+    date_created = EntityValue(_FIXED_DT)
 
     __kind__ = 'user'
 
@@ -45,7 +60,7 @@ class DBModel(DatastoreEntity, UserMixin):
 class ModelMissingKind(DatastoreEntity):
     username = EntityValue('foo')
     password = EntityValue(None)
-    date_created = EntityValue(datetime.datetime.utcnow())
+    date_created = EntityValue(_FIXED_DT)
 
 
 #class TestEntity:
@@ -65,22 +80,80 @@ def test_attrs_declared_as_property_names_are_returned():
     third_party = Entity(conn=False)
     assert "extra_prop" not in third_party.__datastore_properties_lookup__
 
-def test_attrs_not_polluted_from_third_party_classes():
+@pytest.mark.parametrize('model_cls,lookup_list', [
+    (Entity, ['updated_by', 'created_by']),
+    (DBModel, ['username', 'password', 'date_created']),
+])
+def test_attrs_not_polluted_from_third_party_classes(model_cls, lookup_list):
     """
     Attributes from other inherited classes should not pollute
     the lookup list for the model class
     """
-    lookup_list = ['username', 'password', 'date_created']
-    third_party = DBModel(conn=False)
+    third_party = model_cls(conn=False)
     assert sorted(lookup_list) == sorted(
         third_party.__datastore_properties_lookup__)
 
+def test_property_names_are_computed_on_the_class():
+    """
+    Property names declared on a model(and its bases) are collected
+    once, when the class is created
+    """
+    class ChildModel(DBModel):
+        email = EntityValue(None)
+
+    assert sorted(ChildModel.__datastore_props__) == sorted(
+        ['username', 'password', 'date_created', 'email'])
+    assert ChildModel.__datastore_props_set__ == frozenset(
+        ChildModel.__datastore_props__)
+
+def test_lookup_list_copied_from_class():
+    """
+    A new object's lookup list is a copy of the property names
+    computed for the class, so changing it doesn't affect other objects
+    """
+    user = DBModel(conn=False)
+    assert user.__datastore_properties_lookup__ == list(
+        DBModel.__datastore_props__)
+
+    user.ds_client = MagicMock()
+    user.nickname = EntityValue('komla')
+    user.save()
+    assert 'nickname' in user.__datastore_properties_lookup__
+    assert 'nickname' not in DBModel(
+        conn=False).__datastore_properties_lookup__
+    assert 'nickname' not in DBModel.__datastore_props__
+
+def test_inherited_property_replaced_by_plain_attribute():
+    """
+    A property inherited from a base model is not used when the
+    subclass redefines it as a plain attribute
+    """
+    class ChildModel(DBModel):
+        password = None
+
+    assert 'password' not in ChildModel.__datastore_props__
+    assert 'password' not in ChildModel(
+        conn=False).__datastore_properties_lookup__
+
 def test_attr_dsentityvalue_instance():
     """
-    Attribute must be an instance of EntityValue at initialization
+    Attribute must be an instance of EntityValue on the model class
+    and hold the default value on a new object
     """
     user = DBModel(conn=False)
-    assert isinstance(user.username, EntityValue)
+    assert isinstance(DBModel.username, EntityValue)
+    assert user.username == 'foo'
+
+def test_attr_value_is_set_on_object_only():
+    """
+    Setting an attribute's value on one object does not change the
+    default value for other objects
+    """
+    user = DBModel(conn=False)
+    user.username = 'bar'
+
+    assert user.username == 'bar'
+    assert DBModel(conn=False).username == 'foo'
 
 def test_do_not_connect_when_conn_is_false():
     """
@@ -90,6 +163,49 @@ def test_do_not_connect_when_conn_is_false():
     entity = Entity(conn=False)
     assert entity.get_client() is None
 
+def test_client_created_on_first_use_and_shared(build_client):
+    """
+    The datastore client is only created when first used and is shared
+    by objects connecting to the same namespace
+    """
+    first = Entity()
+    second = Entity()
+    build_client.assert_not_called()
+
+    assert first.get_client() is second.get_client()
+    build_client.assert_called_once_with(None, None, None)
+
+def test_client_created_on_first_datastore_call(build_client):
+    """
+    A model initialized with the default 'conn' connects on its first
+    datastore call
+    """
+    entity = Entity()
+    build_client.assert_not_called()
+
+    entity.save()
+    build_client.assert_called_once_with(None, None, None)
+    build_client.return_value.put.assert_called_once()
+
+def test_configure_client():
+    """
+    A configured client is used by all objects of the model
+    """
+    client = MagicMock()
+    Entity.configure_client(client)
+    try:
+        assert Entity().get_client() is client
+        assert DBModel(conn=False).get_client() is None
+    finally:
+        Entity.configure_client(None)
+
+def test_client_passed_at_initialization(ds_client):
+    """
+    An existing client can be passed in instead of connecting
+    """
+    entity = Entity(client=ds_client)
+    assert entity.get_client() is ds_client
+
 def test_lazy_connection():
     """
     Connect to datastore using .connect()
@@ -97,6 +213,84 @@ def test_lazy_connection():
     entity = Entity(conn=False)
     assert entity.connect() is True
 
+def test_connect_to_namespace(build_client):
+    """
+    Connecting to a different namespace uses a client for that namespace
+    """
+    entity = Entity(conn=False)
+    entity.connect(namespace='custom')
+
+    build_client.assert_called_once_with('custom', None, None)
+    assert entity.get_client() is build_client.return_value
+
+def test_clients_shared_per_project(build_client):
+    """
+    Objects connecting to the same project share a client, objects
+    connecting to another project get their own
+    """
+    build_client.side_effect = lambda *key: MagicMock()
+
+    first = Entity(project='foo')
+    second = Entity(project='foo')
+    other = Entity(project='bar')
+
+    assert first.get_client() is second.get_client()
+    assert first.get_client() is not other.get_client()
+    assert build_client.call_count == 2
+
+def test_clients_shared_per_thread(build_client):
+    """
+    Objects of the same thread share a client, objects used in another
+    thread get that thread's client
+    """
+    build_client.side_effect = lambda *key: MagicMock()
+    client = Entity().get_client()
+    assert Entity().get_client() is client
+
+    other_clients = []
+    thread = threading.Thread(
+        target=lambda: other_clients.append(Entity().get_client()))
+    thread.start()
+    thread.join()
+
+    assert other_clients[0] is not client
+
+def test_object_used_in_another_thread_uses_that_threads_client(
+        build_client):
+    """
+    An object keeps no shared client of its own, so awaited calls(run
+    in the executor threads) don't leave their client to the object
+    """
+    clients = []
+    build_client.side_effect = lambda *key: clients.append(
+        MagicMock()) or clients[-1]
+    entity = Entity()
+    asyncio.run(entity.asave())
+
+    assert len(clients) == 1
+    clients[0].put.assert_called_once()
+    assert entity.get_client() is not clients[0]
+
+def test_fetch_parallel_reuses_worker_thread_clients(build_client):
+    """
+    Queries run by fetch_parallel() use the client of the worker
+    thread running them. The workers, and their clients, are reused
+    by later calls
+    """
+    build_client.side_effect = lambda *key: MagicMock()
+    entity = Entity()
+    client = entity.get_client()
+
+    used = []
+    for _ in range(3):
+        queries = [MagicMock() for _ in range(3)]
+        entity.fetch_parallel(queries, max_workers=2)
+        used.extend(query.fetch.call_args[1]['client'] for query in queries)
+
+    assert all(used_client is not client for used_client in used)
+    # the main thread's client and one for each worker at most
+    assert build_client.call_count <= 3
+
 def test_dynamic_attrs_added_on_the_fly_are_used_as_entity_properties():
     """
     Attributes to be used as entity properties can be added after intitialization.
@@ -108,5 +302,511 @@ def test_dynamic_attrs_added_on_the_fly_are_used_as_entity_properties():
 
     assert isinstance(entity.attr_on_the_fly, EntityValue)
 
+def test_save_many_issues_a_single_put_multi():
+    """
+    Saving several objects with save_many() should send all entities
+    to datastore in one put_multi() call
+    """
+    client = MagicMock()
+    entities = [Entity(conn=False) for _ in range(3)]
+    for entity in entities:
+        entity.ds_client = client
+
+    assert Entity.save_many(entities) is True
+    client.put_multi.assert_called_once()
+    assert len(client.put_multi.call_args[0][0]) == 3
+    client.put.assert_not_called()
+
+def test_save_many_with_client_for_objects_without_client():
+    """
+    The client passed to save_many() is also used to build the keys,
+    so the objects don't need a client of their own
+    """
+    client = MagicMock()
+    entities = [Entity(conn=False), Entity(conn=False)]
+
+    assert Entity.save_many(entities, client=client) is True
+    assert client.key.call_count == 2
+    client.put_multi.assert_called_once()
+
+def test_save_many_in_a_transaction():
+    """
+    With transaction=True, the put_multi() call is made inside
+    a datastore transaction
+    """
+    client = MagicMock()
+    entities = [Entity(client=client), Entity(client=client)]
+
+    assert Entity.save_many(entities, transaction=True) is True
+    assert [name for name, args, kwargs in client.mock_calls
+            if name != 'key'] == [
+        'transaction', 'transaction().__enter__', 'put_multi',
+        'transaction().__exit__']
+    assert len(client.put_multi.call_args[0][0]) == 2
+
+def test_save_many_with_no_instances():
+    """
+    Nothing is sent to datastore when there are no objects to save
+    """
+    client = MagicMock()
+    assert Entity.save_many([], client=client) is True
+    client.put_multi.assert_not_called()
+
+def test_get_objs_with_keys_returns_an_object_per_entity(mock_entity):
+    """
+    Entities fetched with get_objs_with_keys() are returned as
+    separate objects, using a single get_multi() call
+    """
+    first = datastore.Entity(datastore.Key('my_entity', 1, project='test'))
+    first.update({'created_by': 'foo'})
+    second = datastore.Entity(datastore.Key('my_entity', 2, project='test'))
+    second.update({'created_by': 'bar'})
+
+    mock_entity.ds_client.get_multi.return_value = [first, second]
+
+    objs = mock_entity.get_objs_with_keys([first.key, second.key])
+
+    mock_entity.ds_client.get_multi.assert_called_once()
+    assert [obj.created_by for obj in objs] == ['foo', 'bar']
+    assert [obj.key for obj in objs] == [first.key, second.key]
+    assert objs[0] is not objs[1]
+
+def test_save_keeps_properties_of_fetched_entity(mock_entity):
+    """
+    Saving an object populated from an entity keeps all the entity's
+    properties, including those not defined in the model class
+    """
+    fetched = datastore.Entity(datastore.Key('my_entity', 1, project='test'))
+    fetched.update({'created_by': 'foo', 'note': 'not in model'})
+
+    obj = mock_entity._obj_from_entity(fetched)
+    obj.created_by = 'bar'
+    obj.save()
+
+    saved = mock_entity.ds_client.put.call_args[0][0]
+    assert dict(saved) == {
+        'created_by': 'bar', 'updated_by': None, 'note': 'not in model'}
+
+def test_save_sets_declared_property_missing_from_fetched_entity(
+        mock_entity):
+    """
+    A property declared on the model but missing from the fetched
+    entity is saved once it is set on the object
+    """
+    fetched = datastore.Entity(datastore.Key('my_entity', 1, project='test'))
+    fetched.update({'created_by': 'foo'})
+
+    obj = mock_entity._obj_from_entity(fetched)
+    obj.updated_by = 'bar'
+    obj.save()
+
+    saved = mock_entity.ds_client.put.call_args[0][0]
+    assert saved['updated_by'] == 'bar'
+
+def test_excludes_only_apply_to_current_save(mock_entity):
+    """
+    Properties excluded from one save are still saved next time
+    """
+    mock_entity.save(excludes=['created_by'])
+    assert 'created_by' not in mock_entity.ds_client.put.call_args[0][0]
+
+    mock_entity.save()
+    assert 'created_by' in mock_entity.ds_client.put.call_args[0][0]
+
+def test_dynamic_attrs_are_saved_with_their_value(mock_entity):
+    """
+    Attributes added on the fly as EntityValue are saved using the
+    value they hold
+    """
+    mock_entity.attr_on_the_fly = EntityValue("Dynamic Value")
+    mock_entity.save()
+
+    saved = mock_entity.ds_client.put.call_args[0][0]
+    assert saved['attr_on_the_fly'] == "Dynamic Value"
+
+def test_extra_props_only_apply_to_current_save(mock_entity):
+    """
+    Extra properties passed to save() are saved with that entity only,
+    they are not set on the object or added to its lookup list
+    """
+    mock_entity.save(extra_props={'status': 'new'})
+    assert mock_entity.ds_client.put.call_args[0][0]['status'] == 'new'
+
+    mock_entity.save()
+    assert 'status' not in mock_entity.ds_client.put.call_args[0][0]
+    assert 'status' not in mock_entity.__datastore_properties_lookup__
+    assert not hasattr(mock_entity, 'status')
+
+def test_extra_props_do_not_replace_object_attributes(mock_entity):
+    """
+    An extra property named like an attribute of the object doesn't
+    change that attribute
+    """
+    key = datastore.Key('my_entity', 1, project='test')
+    mock_entity.key = key
+    mock_entity.save(extra_props={'key': 'k', 'save': 'v'})
+
+    saved = mock_entity.ds_client.put.call_args[0][0]
+    assert saved.key == key
+    assert saved['key'] == 'k'
+    assert mock_entity.key == key
+    assert mock_entity.save() is True
+
+def test_find_by_value_as_iterator(mock_entity):
+    """
+    With as_iterator, the query results are returned without
+    being read into a list
+    """
+    results = iter([])
+    mock_entity.ds_client.query.return_value.fetch.return_value = results
+
+    assert mock_entity.find_by_value('created_by', 'foo',
+                                as_iterator=True) is results
+    assert mock_entity.find_by_value('created_by', 'foo') == []
+
+def test_get_objects_returns_a_new_object_per_entity(mock_entity):
+    """
+    Each entity returned by get_objects() is a separate object
+    holding its own values
+    """
+    first = datastore.Entity(datastore.Key('my_entity', 1, project='test'))
+    first.update({'created_by': 'foo'})
+    second = datastore.Entity(datastore.Key('my_entity', 2, project='test'))
+    second.update({'created_by': 'bar'})
+
+    query = mock_entity.ds_client.query.return_value
+    query.fetch.return_value = [first, second]
+
+    objs, cursor = mock_entity.get_objects('updated_by', None)
+
+    assert cursor is None
+    assert [obj.created_by for obj in objs] == ['foo', 'bar']
+    assert [obj.key for obj in objs] == [first.key, second.key]
+    assert all(obj.get_client() is mock_entity.ds_client for obj in objs)
+
+def test_aget_multi(mock_entity):
+    """
+    aget_multi() can be awaited and fetches all keys in one call
+    """
+    mock_entity.ds_client.get_multi.return_value = ['foo', 'bar']
+
+    result = asyncio.run(mock_entity.aget_multi(['key_1', 'key_2']))
+
+    assert result == ['foo', 'bar']
+    mock_entity.ds_client.get_multi.assert_called_once_with(['key_1', 'key_2'])
+
+def test_fetch_parallel_keeps_query_order():
+    """
+    Results of queries run in parallel are returned in query order
+    """
+    queries = [MagicMock() for _ in range(3)]
+    for i, query in enumerate(queries):
+        query.fetch.return_value = [i]
+
+    entity = Entity(conn=False)
+
+    assert entity.fetch_parallel(queries) == [[0], [1], [2]]
+
+def test_find_by_key_with_cache(mock_entity):
+    """
+    With cache, an entity is fetched from datastore only once until
+    it is saved again
+    """
+    key = datastore.Key('my_entity', 1, project='test')
+    fetched = datastore.Entity(key)
+    fetched.update({'created_by': 'foo'})
+
+    mock_entity.ds_client.get.return_value = fetched
+
+    assert mock_entity.find_by_key(key, cache=True) is fetched
+    assert mock_entity.get_obj_with_key(key, cache=True).created_by == 'foo'
+    mock_entity.ds_client.get.assert_called_once_with(key)
+
+    # saving the mock_entity removes it from the cache
+    mock_entity.save()
+    mock_entity.find_by_key(key, cache=True)
+    assert mock_entity.ds_client.get.call_count == 2
+
+    # without cache, datastore is always called
+    mock_entity.find_by_key(key)
+    assert mock_entity.ds_client.get.call_count == 3
+
+def test_find_via_parent_or_ancestor_filters(mock_entity):
+    """
+    Filters passed to find_via_parent_or_ancestor() are added to the
+    query, replacing the default 'active' filter
+    """
+    ancestor = datastore.Key('Client', 'foo', project='test')
+    query = mock_entity.ds_client.query.return_value
+    query.fetch.return_value = []
+
+    mock_entity.find_via_parent_or_ancestor(ancestor)
+    query.add_filter.assert_called_once_with('active', '=', True)
+
+    query.add_filter.reset_mock()
+    mock_entity.find_via_parent_or_ancestor(
+        ancestor, filters=[('created_by', '=', 'foo')])
+    query.add_filter.assert_called_once_with('created_by', '=', 'foo')
+
+    query.add_filter.reset_mock()
+    mock_entity.find_via_parent_or_ancestor(ancestor, filters=None)
+    query.add_filter.assert_not_called()
+
+def test_delete_many_issues_a_single_delete_multi():
+    """
+    Deleting several objects or keys with delete_many() sends all keys
+    to datastore in one delete_multi() call
+    """
+    client = MagicMock()
+    entity = Entity(conn=False)
+    entity.key = datastore.Key('my_entity', 1, project='test')
+    key = datastore.Key('my_entity', 2, project='test')
+
+    assert Entity.delete_many([entity, key], client=client) is True
+    client.delete_multi.assert_called_once_with([entity.key, key])
+
+def test_delete_many_removes_deleted_keys_from_caches():
+    """
+    Entities deleted by key are removed from the caches of the given
+    objects and from the given cache
+    """
+    key = datastore.Key('my_entity', 1, project='test')
+    other_key = datastore.Key('my_entity', 2, project='test')
+    cache = {key: 'entity', other_key: 'other'}
+    entity_cache = {key: 'entity'}
+    entity = Entity(conn=False, cache_backend=entity_cache)
+    entity.key = other_key
+
+    Entity.delete_many([key], client=MagicMock(), cache_backend=cache)
+    assert cache == {other_key: 'other'}
+
+    Entity.delete_many([entity, key], client=MagicMock())
+    assert entity_cache == {}
+
+def test_shared_cache_backend_used_by_new_objects():
+    """
+    Objects given the same cache_backend find the entities cached
+    by each other
+    """
+    key = datastore.Key('my_entity', 1, project='test')
+    fetched = datastore.Entity(key)
+    fetched.update({'created_by': 'foo'})
+    client = MagicMock()
+    client.get.return_value = fetched
+    cache = {}
+
+    Entity(client=client, cache_backend=cache).get_obj_with_key(
+        key, cache=True)
+    obj = Entity(client=client, cache_backend=cache).get_obj_with_key(
+        key, cache=True)
+
+    assert obj.created_by == 'foo'
+    client.get.assert_called_once_with(key)
+
+def test_delete_uses_object_client(mock_entity):
+    """
+    Deleting a single object uses the object's client
+    """
+    mock_entity.key = datastore.Key('my_entity', 1, project='test')
+
+    assert mock_entity.delete() is True
+    mock_entity.ds_client.delete_multi.assert_called_once_with(
+        [mock_entity.key])
+
+def test_get_objects_pagination_cursor(mock_entity):
+    """
+    With pagination, the cursor for the next page is returned, or None
+    when there are no more entities
+    """
+    fetched = datastore.Entity(datastore.Key('my_entity', 1, project='test'))
+    query_res = mock_entity.ds_client.query.return_value.fetch.return_value
+
+    query_res.__iter__.return_value = iter([fetched])
+    query_res.next_page_token = b'next-page'
+    objs, cursor = mock_entity.get_objects('updated_by', None, paginate=True)
+    assert len(objs) == 1
+    assert cursor == 'next-page'
+
+    query_res.__iter__.return_value = iter([])
+    query_res.next_page_token = None
+    objs, cursor = mock_entity.get_objects('updated_by', None, paginate=True,
+                                      cursor=cursor)
+    assert objs == []
+    assert cursor is None
+    mock_entity.ds_client.query.return_value.fetch.assert_called_with(
+        start_cursor='next-page', limit=500)
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_find_by_values_uses_in_filter_per_30_values(parallel, mock_entity):
+    """
+    find_by_values() makes one 'IN' query for each group of 30 values
+    """
+    ids = iter(range(3))
+    query = mock_entity.ds_client.query.return_value
+    query.fetch.side_effect = lambda **kwargs: [datastore.Entity(
+        datastore.Key('my_entity', next(ids) + 1, project='test'))]
+
+    values = list(range(65))
+    entities = mock_entity.find_by_values('created_by', values,
+                                          parallel=parallel)
+
+    assert sorted(entity.key.id for entity in entities) == [1, 2, 3]
+    assert [c[0][2] for c in query.add_filter.call_args_list] == [
+        values[0:30], values[30:60], values[60:65]]
+    assert all(c[0][:2] == ('created_by', 'IN')
+               for c in query.add_filter.call_args_list)
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_find_by_values_returns_each_entity_once(parallel, mock_entity):
+    """
+    An entity matched by several of the 'IN' queries(eg. a list
+    property) is only returned once
+    """
+    fetched = datastore.Entity(datastore.Key('my_entity', 1, project='test'))
+    query = mock_entity.ds_client.query.return_value
+    query.fetch.return_value = [fetched]
+
+    entities = mock_entity.find_by_values('created_by', list(range(65)),
+                                          parallel=parallel)
+
+    assert entities == [fetched]
+    assert query.fetch.call_count == 3
+
+def test_detect_n_plus_one(monkeypatch, ds_client):
+    """
+    Repeated datastore calls from the same place are reported,
+    batch calls are not
+    """
+    monkeypatch.setattr(datastore.Client, 'get',
+                        lambda self, key, **kwargs: None)
+    monkeypatch.setattr(datastore.Client, 'get_multi',
+                        lambda self, keys, **kwargs: [])
+
+    entity = Entity(client=ds_client)
+    keys = [ds_client.key('my_entity', i) for i in range(3)]
+
+    expected = r'Potential N\+1 .*\(3 calls to get\)'
+    with pytest.warns(UserWarning, match=expected):
+        with Entity.detect_n_plus_one(threshold=3):
+            for key in keys:
+                entity.find_by_key(key)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        with Entity.detect_n_plus_one(threshold=3):
+            entity.find_by_keys(keys)
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_detect_n_plus_one_counts_find_by_values_once(
+        monkeypatch, ds_client, parallel):
+    """
+    The queries made by find_by_values() for many values are
+    counted as one call
+    """
+    monkeypatch.setattr(datastore.Query, 'fetch',
+                        lambda self, **kwargs: iter([]))
+
+    entity = Entity(client=ds_client)
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        with Entity.detect_n_plus_one(threshold=3):
+            entity.find_by_values('created_by', list(range(150)),
+                                  parallel=parallel)
+
+    assert not [w for w in caught if 'N+1' in str(w.message)]
+
+def test_detect_n_plus_one_in_executor_threads(monkeypatch, ds_client):
+    """
+    Calls run in an executor thread are reported for the code
+    awaiting them
+    """
+    monkeypatch.setattr(datastore.Client, 'put',
+                        lambda self, entity, **kwargs: None)
+
+    entity = Entity(client=ds_client)
+
+    async def save_all():
+        for _ in range(3):
+            await entity.asave()
+
+    expected = r'Potential N\+1 .*test_entity\.py:\d+ \(3 calls to put\)'
+    with pytest.warns(UserWarning, match=expected):
+        with Entity.detect_n_plus_one(threshold=3):
+            asyncio.run(save_all())
+
+def test_call_site_in_sibling_package():
+    """
+    Code in a directory only sharing the package directory's name as
+    prefix(eg. datastore_entity_ext) is reported as the call site
+    """
+    filename = os.path.join(ds_module._PACKAGE_DIR + '_ext', 'module.py')
+    code = compile('site = _call_site()', filename, 'exec')
+    namespace = {'_call_site': ds_module._call_site}
+    exec(code, namespace)
+
+    assert namespace['site'] == (filename, 1)
+
+def test_get_obj_with_key_populates_object(mock_entity):
+    """
+    Properties of the fetched entity are set on the object, including
+    those not defined in the model class
+    """
+    key = datastore.Key('my_entity', 1, project='test')
+    fetched = datastore.Entity(key)
+    fetched.update({'created_by': 'foo', 'note': 'not in model'})
+
+    mock_entity.ds_client.get.return_value = fetched
+
+    assert mock_entity.get_obj_with_key(key) is mock_entity
+    assert mock_entity.created_by == 'foo'
+    assert mock_entity.note == 'not in model'
+    assert mock_entity.updated_by is None
+    assert mock_entity.key == key
+    assert sorted(mock_entity.__datastore_properties_lookup__) == [
+        'created_by', 'note', 'updated_by']
+
+def test_object_reused_for_another_entity(mock_entity):
+    """
+    Fetching another entity with the same object replaces the values
+    of the previous entity, none of them are saved with the new one
+    """
+    first = datastore.Entity(datastore.Key('my_entity', 1, project='test'))
+    first.update({'created_by': 'a', 'updated_by': 'a', 'note': 'a'})
+    second = datastore.Entity(datastore.Key('my_entity', 2, project='test'))
+    second.update({'created_by': 'b'})
+
+    mock_entity.ds_client.get.side_effect = [first, second]
+    mock_entity.get_obj_with_key(first.key)
+    mock_entity.get_obj_with_key(second.key)
+    mock_entity.save()
+
+    saved = mock_entity.ds_client.put.call_args[0][0]
+    assert saved.key == second.key
+    assert dict(saved) == {'created_by': 'b', 'updated_by': None}
+    assert not hasattr(mock_entity, 'note')
+
+def test_internal_attrs_not_in_instance_dict():
+    """
+    Attributes used by every object are kept out of the instance dict,
+    which only holds property values
+    """
+    entity = Entity(conn=False)
+    entity.created_by = 'foo'
+
+    assert vars(entity) == {'created_by': 'foo'}
+
+@pytest.mark.integration
+def test_save_and_fetch_entity():
+    """
+    Save an entity to datastore, fetch it using its key then delete it
+    """
+    entity = Entity(namespace='Tests')
+    entity.created_by = 'integration'
+    entity.save(id='integration-test')
 
+    key = entity.generate_key(['my_entity', 'integration-test'])
+    fetched = Entity(namespace='Tests').get_obj_with_key(key)
 
+    assert fetched.created_by == 'integration'
+    assert fetched.delete() is True
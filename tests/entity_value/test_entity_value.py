@@ -2,7 +2,9 @@
 Test cases for entity value module
 """
 
-from datastore_entity import EntityValue
+import pytest
+
+from datastore_entity import DatastoreEntity, EntityValue
 
 
 def test_none_value():
@@ -19,4 +21,27 @@ def test_value_passed():
     """
     value = "foobar"
     entity_value = EntityValue(value)
-    assert entity_value.value == value
\ No newline at end of file
+    assert entity_value.value == value
+
+def test_no_instance_dict():
+    """
+    Check that EntityValue uses slots instead of an instance dict
+    """
+    entity_value = EntityValue()
+    assert not hasattr(entity_value, '__dict__')
+
+def test_assigned_to_class_after_creation():
+    """
+    Check that an EntityValue assigned to a model class after the class
+    is created raises an error instead of being silently ignored
+    """
+    class Model(DatastoreEntity):
+        __kind__ = 'model'
+
+    Model.nickname = EntityValue('foo')
+    obj = Model(conn=False)
+
+    with pytest.raises(TypeError):
+        obj.nickname = 'bar'
+    with pytest.raises(TypeError):
+        obj.nickname